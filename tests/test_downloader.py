@@ -0,0 +1,474 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+import pytest
+import responses
+
+from webdoc_downloader.downloader import _CAN_SPLICE, DocumentDownloader
+from webdoc_downloader.exceptions import NetworkError, ValidationError
+from webdoc_downloader.models import DownloaderConfig
+
+
+PAGE_URL = "http://example.com/docs/index.html"
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    return DocumentDownloader(
+        output_dir=str(tmp_path),
+        config=DownloaderConfig(max_retries=1)
+    )
+
+
+@pytest.fixture(params=["_stream_hrefs", "_extract_hrefs"])
+def parse_hrefs(request, downloader):
+    if request.param == "_extract_hrefs":
+        pytest.importorskip("selectolax.lexbor")
+    return getattr(downloader, request.param)
+
+
+@responses.activate
+@pytest.mark.parametrize("body, content_type, expected", [
+    (
+        '<a href="caf\xe9.pdf">r</a>'.encode("latin-1"),
+        "text/html; charset=iso-8859-1",
+        ["caf\xe9.pdf"],
+    ),
+    (
+        b'<a href="report.pdf">r</a>',
+        "text/html; charset=x-user-defined",
+        ["report.pdf"],
+    ),
+    (
+        '<html><head><meta charset="windows-1252"></head>'
+        '<body><a href="caf\xe9.pdf">r</a></body></html>'.encode("cp1252"),
+        "text/html",
+        ["caf\xe9.pdf"],
+    ),
+    (
+        '<html><head><meta http-equiv="Content-Type" '
+        'content="text/html; charset=ISO-8859-1"></head>'
+        '<body><a href="caf\xe9.pdf">r</a></body></html>'.encode("latin-1"),
+        "text/html",
+        ["caf\xe9.pdf"],
+    ),
+], ids=["header", "unknown-header", "meta-charset", "meta-http-equiv"])
+def test_hrefs_honour_page_charset(
+    downloader, parse_hrefs, body, content_type, expected
+):
+    responses.add(
+        responses.GET, PAGE_URL, body=body, content_type=content_type)
+    response = downloader._make_request(PAGE_URL, stream=True)
+    assert parse_hrefs(response) == expected
+
+
+@pytest.mark.parametrize("url, allowed", [
+    ("http://example.com/docs/a.pdf", True),
+    ("HTTPS://Example.COM/docs/a.pdf", True),
+    ("https://example.com:8443/docs/a.pdf", True),
+    ("http://example.com", True),
+    ("http://example.com.evil/a.pdf", False),
+    ("http://evil.com/example.com/a.pdf", False),
+    ("http://example.com@evil.com/a.pdf", False),
+    ("http://user@example.com/a.pdf", False),
+    ("ftp://example.com/a.pdf", False),
+])
+def test_host_filter(url, allowed):
+    host_re = DocumentDownloader._compile_host_filter(["example.com"])
+    assert bool(host_re.match(url)) is allowed
+
+
+def test_empty_host_filter_allows_any_host(downloader):
+    assert DocumentDownloader._compile_host_filter([]) is None
+    assert downloader._classify(PAGE_URL, "https://other.org/a.pdf") == (
+        "https://other.org/a.pdf", "a.pdf")
+
+
+@pytest.mark.parametrize("href, expected", [
+    ("a.pdf", ("http://example.com/docs/a.pdf", "a.pdf")),
+    ("a.pdf?v=2", ("http://example.com/docs/a.pdf?v=2", "a.pdf")),
+    ("a.pdf;jsessionid=ABC", (
+        "http://example.com/docs/a.pdf;jsessionid=ABC", "a.pdf")),
+    ("/files;v=1/a.pdf", ("http://example.com/files;v=1/a.pdf", "a.pdf")),
+    ("https://cdn.example.com/a.pdf", ("https://cdn.example.com/a.pdf", "a.pdf")),
+    ("a.html", None),
+    ("a.pdf/", None),
+    ("http://files.example.pdf", None),
+    ("http://files.example.pdf?x=1", None),
+    ("//files.example.pdf", None),
+])
+def test_classify_checks_extension_of_url_path(downloader, href, expected):
+    assert downloader._classify(PAGE_URL, href) == expected
+
+
+def test_classify_strips_whitespace_around_href(downloader):
+    assert downloader._classify(PAGE_URL, "  a.pdf\n") == (
+        "http://example.com/docs/a.pdf", "a.pdf")
+
+
+def test_classify_logs_why_links_are_skipped(tmp_path, caplog):
+    downloader = DocumentDownloader(
+        output_dir=str(tmp_path),
+        config=DownloaderConfig(allowed_hosts=["example.com"])
+    )
+    downloader._debug_enabled = True
+    with caplog.at_level(logging.DEBUG, logger="webdoc_downloader"):
+        assert downloader._classify(PAGE_URL, "page.html") is None
+        assert downloader._classify(PAGE_URL, "https://evil.com/a.pdf") is None
+
+    assert [r.getMessage() for r in caplog.records] == [
+        "Skipping non-downloadable link: page.html",
+        "Skipping link to disallowed host: https://evil.com/a.pdf",
+    ]
+
+
+@responses.activate
+def test_download_from_url_dedups_fragments_and_reports_in_link_order(downloader):
+    responses.add(
+        responses.GET,
+        PAGE_URL,
+        body=(
+            b'<a href="b.pdf">b</a>'
+            b'<a href="a.pdf#page=2">a</a>'
+            b'<a href="a.pdf">a</a>'
+            b'<a href="missing.pdf">m</a>'
+        ),
+        content_type="text/html"
+    )
+    for name in ("a.pdf", "b.pdf"):
+        responses.add(
+            responses.GET, "http://example.com/docs/" + name, body=b"%PDF")
+    responses.add(
+        responses.GET, "http://example.com/docs/missing.pdf", status=404)
+
+    report = downloader.download_from_url(PAGE_URL)
+
+    assert report.successful_files == ["a.pdf", "b.pdf"]
+    assert list(report.failed_files) == ["http://example.com/docs/missing.pdf"]
+    assert len([c for c in responses.calls if c.request.url.endswith("/a.pdf")]) == 1
+
+
+@responses.activate
+def test_download_from_url_skips_filename_collisions(downloader):
+    responses.add(
+        responses.GET,
+        PAGE_URL,
+        body=b'<a href="b/report.pdf">b</a><a href="a/report.pdf">a</a>',
+        content_type="text/html"
+    )
+    responses.add(
+        responses.GET, "http://example.com/docs/a/report.pdf", body=b"%PDF")
+
+    report = downloader.download_from_url(PAGE_URL)
+
+    assert report.successful_files == ["report.pdf"]
+    assert report.skipped_files == ["report.pdf"]
+    assert [c.request.url for c in responses.calls] == [
+        PAGE_URL, "http://example.com/docs/a/report.pdf"]
+
+
+FILE_URL = "http://example.com/docs/a.pdf"
+
+
+def _sized_downloader(tmp_path, **limits):
+    responses.add(
+        responses.GET,
+        PAGE_URL,
+        body=b'<a href="a.pdf">a</a>',
+        content_type="text/html"
+    )
+    return DocumentDownloader(
+        output_dir=str(tmp_path),
+        config=DownloaderConfig(max_retries=1, **limits)
+    )
+
+
+@responses.activate
+@pytest.mark.parametrize("limits, downloaded", [
+    ({"max_file_size": 10}, False),
+    ({"min_file_size": 100}, False),
+    ({"min_file_size": 10, "max_file_size": 100}, True),
+])
+def test_size_filter_uses_head_content_length(tmp_path, limits, downloaded):
+    downloader = _sized_downloader(tmp_path, **limits)
+    responses.add(responses.HEAD, FILE_URL, headers={"Content-Length": "50"})
+    responses.add(responses.GET, FILE_URL, body=b"x" * 50)
+
+    report = downloader.download_from_url(PAGE_URL)
+
+    gets = [c for c in responses.calls
+            if c.request.method == "GET" and c.request.url == FILE_URL]
+    assert len(gets) == int(downloaded)
+    assert report.successful_files == (["a.pdf"] if downloaded else [])
+    assert report.skipped_files == ([] if downloaded else ["a.pdf"])
+    assert (tmp_path / "a.pdf").exists() is downloaded
+
+
+@responses.activate
+@pytest.mark.parametrize("get_has_length", [True, False])
+def test_size_filter_checks_files_head_cannot_size(tmp_path, get_has_length):
+    downloader = _sized_downloader(tmp_path, max_file_size=10)
+    responses.add(responses.HEAD, FILE_URL, status=405)
+    responses.add(
+        responses.GET,
+        FILE_URL,
+        body=b"x" * 50,
+        auto_calculate_content_length=get_has_length
+    )
+
+    report = downloader.download_from_url(PAGE_URL)
+
+    assert report.successful_files == []
+    assert report.failed_files == {}
+    assert report.skipped_files == ["a.pdf"]
+    assert not (tmp_path / "a.pdf").exists()
+
+
+class ScriptedHTTPServer:
+    """Keep-alive HTTP/1.1 server whose responses are written by a callback.
+
+    The callback receives the connected socket and the request path and is
+    responsible for sending the whole response, so tests control exactly
+    how the bytes arrive on the wire.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.connections = 0
+        self._sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def close(self):
+        self._sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(
+                target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn, conn.makefile("rb") as rfile:
+            while True:
+                request_line = rfile.readline()
+                if not request_line:
+                    return
+                while rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                path = request_line.split()[1].decode()
+                if not self.respond(conn, path):
+                    return
+
+
+def _headers(length):
+    return (
+        "HTTP/1.1 200 OK\r\n"
+        f"Content-Length: {length}\r\n"
+        "Content-Type: application/pdf\r\n"
+        "\r\n"
+    ).encode()
+
+
+@pytest.fixture
+def http_server():
+    servers = []
+
+    def start(respond):
+        server = ScriptedHTTPServer(respond)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+requires_splice = pytest.mark.skipif(
+    not _CAN_SPLICE, reason="splice(2) is only available on Linux")
+
+
+@requires_splice
+def test_splice_body_keeps_prefix_already_buffered(downloader, http_server, tmp_path):
+    body = os.urandom(300_000)
+
+    def respond(conn, path):
+        # Headers and the start of the body arrive in one segment, so
+        # http.client buffers part of the body before splice(2) runs
+        conn.sendall(_headers(len(body)) + body[:1000])
+        time.sleep(0.05)
+        conn.sendall(body[1000:])
+        return True
+
+    server = http_server(respond)
+    output_path = tmp_path / "file.pdf"
+    with downloader._make_request(server.url("/file.pdf"), stream=True) as response:
+        with open(output_path, "wb") as f:
+            assert downloader._splice_body(response, f)
+    assert output_path.read_bytes() == body
+
+
+@requires_splice
+def test_splice_body_raises_on_early_close(downloader, http_server, tmp_path):
+    def respond(conn, path):
+        conn.sendall(_headers(100_000) + b"x" * 500)
+        return False
+
+    server = http_server(respond)
+    with pytest.raises(NetworkError):
+        downloader._download_file(server.url("/short.pdf"), tmp_path / "short.pdf")
+
+
+@requires_splice
+def test_splice_body_returns_connection_to_pool(downloader, http_server, mocker, tmp_path):
+    body = os.urandom(200_000)
+
+    def respond(conn, path):
+        conn.sendall(_headers(len(body)))
+        conn.sendall(body)
+        return True
+
+    server = http_server(respond)
+    splice = mocker.spy(downloader, "_splice_body")
+    for name in ("a.pdf", "b.pdf"):
+        assert downloader._download_file(server.url("/" + name), tmp_path / name) == len(body)
+        assert (tmp_path / name).read_bytes() == body
+
+    assert splice.spy_return is True
+    assert splice.call_count == 2
+    assert server.connections == 1
+
+
+def test_max_retries_counts_total_attempts(tmp_path, http_server):
+    downloader = DocumentDownloader(
+        output_dir=str(tmp_path), config=DownloaderConfig(max_retries=3))
+    requests_seen = []
+
+    def respond(conn, path):
+        requests_seen.append(path)
+        conn.sendall(
+            b"HTTP/1.1 503 Service Unavailable\r\n"
+            b"Content-Length: 0\r\n"
+            b"Retry-After: 3600\r\n"
+            b"\r\n"
+        )
+        return True
+
+    server = http_server(respond)
+    with pytest.raises(NetworkError):
+        downloader._make_request(server.url("/a.pdf"))
+    assert requests_seen == ["/a.pdf"] * 3
+
+
+def test_http2_client_carries_session_cookies_and_auth(downloader):
+    pytest.importorskip("h2")
+    downloader.session.cookies.set("sessionid", "abc", domain="example.com")
+    downloader.session.auth = ("user", "secret")
+    with downloader._http2_client() as client:
+        assert client.cookies.get("sessionid") == "abc"
+        assert client.auth is not None
+
+
+def test_http2_client_not_used_with_custom_session_auth(downloader):
+    pytest.importorskip("h2")
+    downloader.session.auth = lambda request: request
+    with downloader._http2_client() as client:
+        assert client is None
+
+
+@pytest.fixture
+def proxy_env(monkeypatch, http_server):
+    """Point HTTPS_PROXY at a local server that records CONNECT targets."""
+    tunnels = []
+
+    def respond(conn, path):
+        tunnels.append(path)
+        return False
+
+    proxy = http_server(respond)
+    for name in ("ALL_PROXY", "all_proxy", "https_proxy", "no_proxy"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("HTTPS_PROXY", proxy.url(""))
+    monkeypatch.setenv("NO_PROXY", "localhost")
+    return tunnels
+
+
+def test_http2_client_uses_env_proxy(downloader, proxy_env, tmp_path):
+    pytest.importorskip("h2")
+    with downloader._http2_client() as client:
+        with pytest.raises(NetworkError):
+            downloader._download_file_http2(
+                client, "https://example.com/a.pdf", tmp_path / "a.pdf")
+    assert proxy_env == ["example.com:443"]
+
+
+def test_http2_client_honours_no_proxy(downloader, proxy_env, tmp_path):
+    pytest.importorskip("h2")
+    # Nothing listens on port 1, so a direct connection fails at once
+    with downloader._http2_client() as client:
+        with pytest.raises(NetworkError):
+            downloader._download_file_http2(
+                client, "https://localhost:1/a.pdf", tmp_path / "a.pdf")
+    assert proxy_env == []
+
+
+def test_download_file_http2_retries_server_errors(downloader, mocker, tmp_path):
+    httpx = pytest.importorskip("httpx")
+    downloader.config.max_retries = 3
+    sleep = mocker.patch("webdoc_downloader.downloader.time.sleep")
+    statuses = iter([503, 502, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), content=b"%PDF")
+
+    output_path = tmp_path / "a.pdf"
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        size = downloader._download_file_http2(
+            client, "https://example.com/a.pdf", output_path)
+
+    assert size == 4
+    assert output_path.read_bytes() == b"%PDF"
+    assert sleep.call_count == 2
+
+
+def test_download_file_http2_gives_up_after_max_retries(downloader, mocker, tmp_path):
+    httpx = pytest.importorskip("httpx")
+    downloader.config.max_retries = 2
+    mocker.patch("webdoc_downloader.downloader.time.sleep")
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("refused", request=request)
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(NetworkError):
+            downloader._download_file_http2(
+                client, "https://example.com/a.pdf", tmp_path / "a.pdf")
+    assert len(calls) == 2
+
+
+def test_download_file_http2_rejects_declared_size(downloader, tmp_path):
+    httpx = pytest.importorskip("httpx")
+    downloader.config.max_file_size = 10
+
+    def handler(request):
+        return httpx.Response(200, content=b"x" * 50)
+
+    output_path = tmp_path / "a.pdf"
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(ValidationError):
+            downloader._download_file(
+                "https://example.com/a.pdf", output_path, client)
+    assert not output_path.exists()
@@ -0,0 +1,35 @@
+import pytest
+from pydantic import ValidationError
+
+from webdoc_downloader.models import DownloaderConfig
+
+
+@pytest.mark.parametrize("concurrency", [0, -1])
+def test_concurrency_must_be_positive(concurrency):
+    with pytest.raises(ValidationError):
+        DownloaderConfig(max_concurrent_downloads=concurrency)
+
+
+def test_allowed_extensions_are_normalized():
+    config = DownloaderConfig(allowed_extensions=["PDF", ".Docx", "", "zip"])
+    assert config.allowed_extensions == [".pdf", ".docx", ".zip"]
+    assert config.ext_tuple == (".pdf", ".docx", ".zip")
+
+
+def test_ext_tuple_follows_assignment():
+    config = DownloaderConfig()
+    config.allowed_extensions = ["ZIP"]
+    assert config.allowed_extensions == [".zip"]
+    assert config.ext_tuple == (".zip",)
+
+
+def test_ext_tuple_follows_model_copy():
+    config = DownloaderConfig()
+    assert ".pdf" in config.ext_tuple
+    copy = config.model_copy(update={"allowed_extensions": [".zip"]})
+    assert copy.ext_tuple == (".zip",)
+    assert ".pdf" in config.ext_tuple
+
+
+def test_ext_tuple_not_dumped():
+    assert "ext_tuple" not in DownloaderConfig().model_dump()
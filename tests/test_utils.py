@@ -0,0 +1,35 @@
+import pytest
+
+from webdoc_downloader.utils import sanitize_filename
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("report.pdf", "report.pdf"),
+    ('a<b>c:d"e|f?g*.pdf', "a_b_c_d_e_f_g_.pdf"),
+    ("dir\\file.pdf", "dir_file.pdf"),
+    ("tab\there\x00.pdf", "tabhere.pdf"),
+    ("", "_"),
+    ("\x01\x02", "_"),
+])
+def test_sanitize_filename(filename, expected):
+    assert sanitize_filename(filename) == expected
+
+
+def test_sanitize_filename_keeps_extension_when_truncating():
+    result = sanitize_filename("a" * 300 + ".pdf")
+    assert result == "a" * 251 + ".pdf"
+
+
+def test_sanitize_filename_limits_utf8_bytes():
+    # Each "é" is two bytes in UTF-8, so 200 of them exceed the limit
+    # even though they are only 200 characters
+    result = sanitize_filename("\xe9" * 200 + ".pdf")
+    assert result.endswith(".pdf")
+    assert len(result.encode("utf-8")) <= 255
+    assert result == "\xe9" * 125 + ".pdf"
+
+
+def test_sanitize_filename_with_oversized_extension():
+    result = sanitize_filename("a." + "b" * 300)
+    assert len(result.encode("utf-8")) == 255
+    assert result.startswith("a.b")
@@ -51,11 +51,28 @@ def download(
         "-t",
         help="Request timeout in seconds"
     ),
+    concurrency: int = typer.Option(
+        16,
+        "--concurrency",
+        "-c",
+        min=1,
+        help="Maximum number of files to download at once"
+    ),
+    http2: bool = typer.Option(
+        True,
+        "--http2/--no-http2",
+        help="Download files from HTTPS origins over HTTP/2 when supported"
+    ),
     allowed_extensions: str = typer.Option(
         ".pdf,.doc,.docx",
         "--allowed-extensions",
         "-e",
         help="Comma-separated list of allowed file extensions"
+    ),
+    allowed_hosts: str = typer.Option(
+        "",
+        "--allowed-hosts",
+        help="Comma-separated list of hosts to download from (default: any)"
     )
 ):
     """Download documents from a webpage."""
@@ -66,11 +83,16 @@ def download(
 
         # Convert comma-separated extensions to list
         extension_list = [ext.strip() for ext in allowed_extensions.split(",")]
+        host_list = [host.strip()
+                     for host in allowed_hosts.split(",") if host.strip()]
 
         config = DownloaderConfig(
             max_retries=max_retries,
             timeout=timeout,
-            allowed_extensions=extension_list
+            max_concurrent_downloads=concurrency,
+            http2=http2,
+            allowed_extensions=extension_list,
+            allowed_hosts=host_list
         )
 
         downloader = DocumentDownloader(
@@ -1,17 +1,58 @@
+from __future__ import annotations
+
+import codecs
 import logging
+import os
+import re
+import select
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List
-from urllib.parse import urlparse, urljoin  # Add urlparse here
-
-import requests
-from bs4 import BeautifulSoup
-from pydantic import HttpUrl, DirectoryPath
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, List, Tuple
+from urllib.parse import urldefrag, urlparse, urljoin  # Add urlparse here
 
 from .models import DownloaderConfig, DownloadReport
-from .exceptions import DownloadError, InvalidURLError, NetworkError
+from .exceptions import (
+    DownloadError, InvalidURLError, NetworkError, ValidationError)
 from .utils import setup_logging, is_valid_file, sanitize_filename
 
+# requests and lxml are imported where they are used so that importing the
+# CLI (e.g. for --help) does not pay for them
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+# Size of each read/write, and of the file write buffer, when copying a
+# response body to disk
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+# Statuses retried with exponential backoff, capped at _RETRY_BACKOFF_MAX
+# seconds between attempts
+_RETRY_STATUSES = (500, 502, 503, 504)
+_RETRY_BACKOFF_FACTOR = 0.3
+_RETRY_BACKOFF_MAX = 10
+
+# The path of a URL, like urlparse().path: without the scheme and host,
+# without the ;params of the last segment (e.g. ;jsessionid=...), and
+# without the query string or fragment
+_PATH_RE = re.compile(
+    r'^(?:[a-z][a-z0-9+.-]*:)?(?://[^/?#]*)?([^?#]*?)(?:;[^/?#]*)?(?=[?#]|$)',
+    re.IGNORECASE
+)
+
+# A charset given by <meta charset> or <meta http-equiv="Content-Type">;
+# like browsers, only the first 1024 bytes of the page are searched
+_META_CHARSET_RE = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+_META_PRESCAN_BYTES = 1024
+
+# splice(2) moves socket data into a file without copying it through Python
+_CAN_SPLICE = sys.platform == 'linux' and hasattr(os, 'splice')
+
 
 class DocumentDownloader:
     """Main class for downloading documents from web pages."""
@@ -23,11 +64,33 @@ class DocumentDownloader:
     ):
         self.output_dir = Path(output_dir or "out")
         self.config = config or DownloaderConfig()
+        self._host_re = self._compile_host_filter(self.config.allowed_hosts)
         self.logger = setup_logging()
+        # Checked once up front for the per-link messages in the scan loop;
+        # the logger level is expected to be set before construction
+        self._info_enabled = self.logger.isEnabledFor(logging.INFO)
+        self._debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
         self.session = self._setup_session()
+        # Origins that answered over HTTP/1.1 and so gain nothing from httpx
+        self._http1_origins = set()
+
+    @staticmethod
+    def _compile_host_filter(hosts: List[str]) -> Optional[re.Pattern]:
+        """Build one regex matching absolute URLs on any of the given hosts."""
+        if not hosts:
+            return None
+        alternation = '|'.join(re.escape(host) for host in hosts)
+        return re.compile(
+            r'^https?://(?:' + alternation + r')(?::\d+)?(?:[/?#]|$)',
+            re.IGNORECASE
+        )
 
     def _setup_session(self) -> requests.Session:
         """Configure requests session with retry handling."""
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
         session = requests.Session()
 
         # Always set a User-Agent
@@ -41,12 +104,34 @@ class DocumentDownloader:
         # Configure SSL verification
         session.verify = self.config.verify_ssl
 
+        # Keep enough pooled connections alive for every download worker and
+        # let urllib3 retry transient failures
+        pool_size = max(32, self.config.max_concurrent_downloads)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            pool_block=False,
+            max_retries=Retry(
+                # max_retries counts attempts, so the first one isn't a retry
+                total=max(self.config.max_retries - 1, 0),
+                backoff_factor=_RETRY_BACKOFF_FACTOR,
+                backoff_max=_RETRY_BACKOFF_MAX,
+                status_forcelist=_RETRY_STATUSES,
+                # A large Retry-After would otherwise stall a worker for as
+                # long as the server asks
+                respect_retry_after_header=False
+            )
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
         return session
 
     def download_from_url(self, url: str) -> DownloadReport:
         """Download all documents from the specified URL."""
-        self.logger.info(f"Starting download from: {url}")
-        report = DownloadReport(start_time=datetime.now())
+        self.logger.info("Starting download from: %s", url)
+        report = DownloadReport(
+            start_time=datetime.now(), start_ns=time.monotonic_ns())
 
         try:
             # Ensure output directory exists
@@ -54,105 +139,369 @@ class DocumentDownloader:
 
             # Fetch and parse the webpage
             self.logger.info("Fetching webpage...")
-            response = self._make_request(url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Find all links in the page
-            links = soup.find_all('a', href=True)
-            self.logger.info(f"Found total of {len(links)} links on the page")
-
-            file_links = []
-            for link in links:
-                href = link['href']
-                if self._is_downloadable_link(href):
-                    # Convert relative URL to absolute URL
-                    absolute_url = self._normalize_url(url, href)
-                    file_links.append(absolute_url)
+            with self._make_request(url, stream=True) as response:
+                hrefs = self._extract_hrefs(response)
+            self.logger.info("Found total of %d links on the page", len(hrefs))
+
+            # Key by URL so a file linked several times (e.g. from both the
+            # sidebar and the body) is only fetched once
+            file_links = {}
+            for href in hrefs:
+                link = self._classify(url, href)
+                if link is None:
+                    continue
+
+                absolute_url, filename = link
+                file_links[absolute_url] = filename
+                if self._info_enabled:
                     self.logger.info(
-                        f"Found downloadable link: {absolute_url}")
-                else:
-                    self.logger.debug(
-                        f"Skipping non-downloadable link: {href}")
+                        "Found downloadable link: %s", absolute_url)
 
             self.logger.info(
-                f"Found {len(file_links)} potential document links")
+                "Found %d potential document links", len(file_links))
 
-            # Download each file
-            for file_url in file_links:
-                try:
-                    # Don't need to normalize URL here since it's already done
-                    filename = sanitize_filename(
-                        Path(urlparse(file_url).path).name)
+            # Skip files that already exist or are claimed by an earlier link
+            # before issuing any request for them
+            pending = {}
+            claimed = {}
+            for file_url in sorted(file_links):
+                filename = file_links[file_url]
+                if filename in claimed:
+                    self.logger.info(
+                        "Skipping %s: filename %s is already used by %s",
+                        file_url, filename, claimed[filename])
+                elif (self.output_dir / filename).exists():
+                    self.logger.info("Skipping existing file: %s", filename)
+                else:
+                    pending[file_url] = filename
+                    claimed[filename] = file_url
+                    continue
+                report.skipped_files.append(filename)
+                report.skipped_count += 1
 
-                    # Skip if file exists
-                    if (self.output_dir / filename).exists():
-                        self.logger.info(f"Skipping existing file: {filename}")
+            # When size limits are set, check them with HEAD requests so
+            # rejected files are never downloaded; files whose size HEAD
+            # can't tell are checked again by _download_file
+            if self.config.min_file_size or self.config.max_file_size:
+                sizes = self._head_sizes(list(pending))
+                for file_url, size in sizes.items():
+                    if size is not None and not self._is_valid_file_size(size):
+                        filename = pending.pop(file_url)
+                        self.logger.info(
+                            "Skipping %s: size of %d bytes is outside the allowed range",
+                            filename, size)
                         report.skipped_files.append(filename)
                         report.skipped_count += 1
-                        continue
 
-                    # Download the file
-                    file_response = self._make_request(file_url, stream=True)
-                    file_size = int(
-                        file_response.headers.get('content-length', 0))
+            # Download the remaining files concurrently and collect each
+            # outcome as it comes back
+            outcomes = {}
+            with self._http2_client() as client, ThreadPoolExecutor(
+                max_workers=self.config.max_concurrent_downloads
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        self._download_file,
+                        file_url,
+                        self.output_dir / filename,
+                        client
+                    ): file_url
+                    for file_url, filename in pending.items()
+                }
+                for future in as_completed(futures):
+                    file_url = futures[future]
+                    try:
+                        outcomes[file_url] = future.result()
+                    except ValidationError as e:
+                        self.logger.info(
+                            "Skipping %s: %s", pending[file_url], e)
+                        outcomes[file_url] = e
+                    except Exception as e:
+                        self.logger.error(
+                            "Failed to download %s: %s", file_url, e)
+                        outcomes[file_url] = e
 
-                    # Save the file
-                    output_path = self.output_dir / filename
-                    bytes_written = self._save_file(file_response, output_path)
-
-                    # Update report
+            # Fill the report in link order so it doesn't depend on which
+            # download happened to finish first
+            for file_url, filename in pending.items():
+                outcome = outcomes[file_url]
+                if isinstance(outcome, ValidationError):
+                    report.skipped_files.append(filename)
+                    report.skipped_count += 1
+                elif isinstance(outcome, Exception):
+                    report.failed_files[file_url] = str(outcome)
+                    report.failed_count += 1
+                else:
                     report.successful_files.append(filename)
                     report.success_count += 1
-                    report.total_size += bytes_written
-
-                except Exception as e:
-                    self.logger.error(f"Failed to download {
-                                      file_url}: {str(e)}")
-                    report.failed_files[file_url] = str(e)
-                    report.failed_count += 1
+                    report.total_size += outcome
 
         except Exception as e:
-            self.logger.error(f"Download failed: {str(e)}")
+            self.logger.error("Download failed: %s", e)
             raise DownloadError(f"Failed to download from {url}: {str(e)}")
         finally:
             report.end_time = datetime.now()
+            report.end_ns = time.monotonic_ns()
 
         return report
 
-    def _make_request(self, url: str, stream: bool = False) -> requests.Response:
-        """Make HTTP request with retry logic."""
-        for attempt in range(self.config.max_retries):
+    @staticmethod
+    def _declared_encoding(response: requests.Response) -> Optional[str]:
+        """Return the charset from the Content-Type header, if Python knows it."""
+        # requests falls back to ISO-8859-1 for text/* when no charset is
+        # given, which is usually wrong for HTML
+        content_type = response.headers.get('content-type', '').lower()
+        if 'charset' not in content_type:
+            return None
+
+        # Leave charsets Python has no codec for (e.g. x-user-defined) to
+        # the parser's own detection
+        try:
+            codecs.lookup(response.encoding)
+        except LookupError:
+            return None
+        return response.encoding
+
+    @staticmethod
+    def _meta_encoding(content: bytes) -> Optional[str]:
+        """Return the charset a page declares in <meta>, if Python knows it."""
+        match = _META_CHARSET_RE.search(content, 0, _META_PRESCAN_BYTES)
+        if match is None:
+            return None
+        try:
+            name = codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            return None
+        # A page that could be read far enough to find the tag isn't
+        # UTF-16, so browsers treat such a declaration as UTF-8
+        return 'utf-8' if name.startswith('utf-16') else name
+
+    def _extract_hrefs(self, response: requests.Response) -> List[str]:
+        """Collect all anchor hrefs on the page."""
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError:
+            return self._stream_hrefs(response)
+
+        # Lexbor treats bytes as UTF-8 and ignores <meta charset>, so decode
+        # up front if the server or the page says otherwise
+        content = response.content
+        encoding = (
+            self._declared_encoding(response) or self._meta_encoding(content))
+        if encoding:
+            content = content.decode(encoding, errors='replace')
+
+        tree = LexborHTMLParser(content)
+        return [
+            node.attributes['href'] for node in tree.css('a[href]')
+            if node.attributes['href'] is not None
+        ]
+
+    def _stream_hrefs(self, response: requests.Response) -> List[str]:
+        """Parse the page as it streams in and collect all anchor hrefs."""
+        from lxml import etree
+
+        # Without a declared charset lxml sniffs <meta charset> itself
+        encoding = self._declared_encoding(response)
+        parser = etree.HTMLPullParser(
+            events=('end',), tag='a', encoding=encoding)
+        hrefs = []
+
+        def collect():
+            for _, element in parser.read_events():
+                href = element.get('href')
+                if href is not None:
+                    hrefs.append(href)
+                # Drop the anchor's content so the tree stays small
+                element.clear()
+
+        for chunk in response.iter_content(chunk_size=65536):
+            parser.feed(chunk)
+            collect()
+        parser.close()
+        collect()
+        return hrefs
+
+    def _head_sizes(self, urls: List[str]) -> Dict[str, Optional[int]]:
+        """Return the Content-Length of each URL, or None if it is unknown."""
+        import requests
+
+        def head_size(file_url: str) -> Optional[int]:
             try:
-                response = self.session.get(
-                    url,
-                    timeout=self.config.timeout,
-                    stream=stream
+                response = self.session.head(
+                    file_url,
+                    allow_redirects=True,
+                    timeout=self.config.timeout
                 )
                 response.raise_for_status()
-                return response
-            except requests.RequestException as e:
-                if attempt == self.config.max_retries - 1:
-                    raise NetworkError(f"Failed to fetch {url} after {
-                                       self.config.max_retries} attempts: {str(e)}")
-                self.logger.warning(
-                    f"Attempt {attempt + 1} failed, retrying...")
-
-    def _is_downloadable_link(self, href: str) -> bool:
-        """Check if the link points to a downloadable file."""
-        if not href or href.startswith('#') or href.startswith('javascript:'):
-            return False
+                return int(response.headers['content-length'])
+            except (requests.RequestException, KeyError, ValueError):
+                return None
+
+        with ThreadPoolExecutor(
+            max_workers=self.config.max_concurrent_downloads
+        ) as executor:
+            return dict(zip(urls, executor.map(head_size, urls)))
+
+    @contextmanager
+    def _http2_client(self) -> Iterator[Optional[httpx.Client]]:
+        """Yield a shared HTTP/2 client, or None if disabled or unavailable."""
+        if not self.config.http2:
+            yield None
+            return
+        try:
+            import h2  # noqa: F401
+            import httpx
+        except ImportError:
+            yield None
+            return
+
+        # httpx can't run requests auth hooks, so leave sessions using them
+        # on the requests path
+        auth = self.session.auth
+        if auth is not None and not isinstance(auth, tuple):
+            yield None
+            return
+
+        # Connection-specific headers are forbidden in HTTP/2, and httpx
+        # advertises the encodings it can decode itself
+        headers = {
+            name: value for name, value in self.session.headers.items()
+            if name.lower() not in ('connection', 'accept-encoding')
+        }
+        limits = httpx.Limits(
+            max_connections=self.config.max_concurrent_downloads,
+            max_keepalive_connections=self.config.max_concurrent_downloads
+        )
+        # No explicit transport: httpx only applies HTTPS_PROXY/NO_PROXY
+        # from the environment to the transports it builds itself. Retries
+        # are done per request in _download_file_http2
+        with httpx.Client(
+            http2=True,
+            verify=self.config.verify_ssl,
+            limits=limits,
+            headers=headers,
+            cookies=self.session.cookies,
+            auth=auth,
+            timeout=self.config.timeout,
+            follow_redirects=True
+        ) as client:
+            yield client
+
+    def _download_file(
+        self,
+        file_url: str,
+        output_path: Path,
+        client: Optional[httpx.Client] = None
+    ) -> int:
+        """Download a single file to output_path and return bytes written.
+
+        Raises ValidationError, without keeping the file, if its size is
+        outside the configured limits.
+        """
+        # HTTP/2 needs TLS; plain http and HTTP/1.1-only origins keep using
+        # the pooled requests session
+        origin = urlparse(file_url)
+        if (
+            client is not None
+            and origin.scheme == 'https'
+            and origin.netloc not in self._http1_origins
+        ):
+            size = self._download_file_http2(client, file_url, output_path)
+        else:
+            with self._make_request(file_url, stream=True) as response:
+                self._check_declared_size(response.headers)
+                size = self._save_file(response, output_path)
+
+        # Bodies sent without a Content-Length are only caught once written
+        if not self._is_valid_file_size(size):
+            output_path.unlink()
+            raise ValidationError(
+                f"size of {size} bytes is outside the allowed range")
+        return size
+
+    def _download_file_http2(
+        self, client: httpx.Client, file_url: str, output_path: Path
+    ) -> int:
+        """Download a file over the shared httpx client.
+
+        Failed connections and the statuses in _RETRY_STATUSES are retried
+        with the same attempt count and backoff as the requests session.
+        """
+        import httpx
+
+        attempts = max(self.config.max_retries, 1)
+        for attempt in range(1, attempts + 1):
+            try:
+                with client.stream('GET', file_url) as response:
+                    if response.http_version != 'HTTP/2':
+                        self._http1_origins.add(urlparse(file_url).netloc)
+                    if (
+                        response.status_code not in _RETRY_STATUSES
+                        or attempt == attempts
+                    ):
+                        response.raise_for_status()
+                        self._check_declared_size(response.headers)
+                        with open(output_path, 'wb', buffering=_COPY_BUFFER_SIZE) as f:
+                            for chunk in response.iter_bytes(_COPY_BUFFER_SIZE):
+                                f.write(chunk)
+                            f.flush()
+                            return os.fstat(f.fileno()).st_size
+            except httpx.TransportError as e:
+                if attempt == attempts:
+                    raise NetworkError(f"Failed to fetch {file_url}: {str(e)}")
+            except httpx.HTTPError as e:
+                raise NetworkError(f"Failed to fetch {file_url}: {str(e)}")
+            time.sleep(min(
+                _RETRY_BACKOFF_FACTOR * 2 ** (attempt - 1), _RETRY_BACKOFF_MAX))
+
+    def _make_request(self, url: str, stream: bool = False) -> requests.Response:
+        """Make HTTP request; retries are handled by the session adapter."""
+        import requests
+
+        try:
+            response = self.session.get(
+                url,
+                timeout=self.config.timeout,
+                stream=stream
+            )
+            response.raise_for_status()
+            if stream:
+                # Reading response.raw directly must still undo gzip/deflate
+                response.raw.decode_content = True
+            return response
+        except requests.RequestException as e:
+            raise NetworkError(f"Failed to fetch {url}: {str(e)}")
 
-        # Get the URL path without query parameters
-        parsed_url = urlparse(href)
-        path = parsed_url.path.lower()
+    def _classify(self, base_url: str, href: str) -> Optional[Tuple[str, str]]:
+        """Return (absolute_url, filename) for a downloadable link, or None.
 
-        # Check file extensions
-        return any(path.endswith(ext.lower()) for ext in self.config.allowed_extensions)
+        Rejected links are logged at debug level with the reason.
+        """
+        # Attribute values may carry whitespace from the page's markup
+        href = href.strip()
+        if not href or href.startswith(('#', 'javascript:')):
+            return self._skip_link("Skipping non-downloadable link: %s", href)
 
-    def _normalize_url(self, base_url: str, file_url: str) -> str:
-        """Convert relative URLs to absolute URLs."""
-        from urllib.parse import urljoin
-        return urljoin(base_url, file_url)
+        # Check the URL path (without parameters or query) against extensions
+        path = _PATH_RE.match(href).group(1)
+        if not path.lower().endswith(self.config.ext_tuple):
+            return self._skip_link("Skipping non-downloadable link: %s", href)
+
+        # Convert relative URL to absolute URL; the fragment never reaches
+        # the server, so drop it to fetch "a.pdf#page=2" and "a.pdf" once
+        absolute_url = urldefrag(urljoin(base_url, href)).url
+        if self._host_re and not self._host_re.match(absolute_url):
+            return self._skip_link(
+                "Skipping link to disallowed host: %s", absolute_url)
+
+        return absolute_url, sanitize_filename(path.rsplit('/', 1)[-1])
+
+    def _skip_link(self, message: str, link: str) -> None:
+        """Log why a link is skipped when debug logging is on."""
+        if self._debug_enabled:
+            self.logger.debug(message, link)
+        return None
 
     def _is_valid_file_size(self, size: int) -> bool:
         """Check if file size meets configured constraints."""
@@ -162,12 +511,84 @@ class DocumentDownloader:
             return False
         return True
 
+    def _check_declared_size(self, headers) -> None:
+        """Raise ValidationError if Content-Length is outside the limits."""
+        try:
+            size = int(headers['content-length'])
+        except (KeyError, ValueError):
+            return
+        if not self._is_valid_file_size(size):
+            raise ValidationError(
+                f"size of {size} bytes is outside the allowed range")
+
     def _save_file(self, response: requests.Response, output_path: Path) -> int:
         """Save downloaded file to disk and return bytes written."""
-        bytes_written = 0
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    bytes_written += len(chunk)
-        return bytes_written
+        with open(output_path, 'wb', buffering=_COPY_BUFFER_SIZE) as f:
+            if not self._splice_body(response, f):
+                shutil.copyfileobj(response.raw, f, length=_COPY_BUFFER_SIZE)
+            f.flush()
+            return os.fstat(f.fileno()).st_size
+
+    def _splice_body(self, response: requests.Response, f) -> bool:
+        """Move the body from the socket into f with splice(2).
+
+        Only plain HTTP bodies with a Content-Length and no content coding
+        qualify; returns False without reading anything otherwise.
+        """
+        raw_fp = getattr(response.raw, '_fp', None)
+        if (
+            not _CAN_SPLICE
+            or getattr(raw_fp, 'fp', None) is None
+            or getattr(raw_fp, 'chunked', True)
+            or getattr(raw_fp, 'length', None) is None
+            or urlparse(response.url).scheme != 'http'
+            or response.headers.get('content-encoding', 'identity').lower() != 'identity'
+        ):
+            return False
+
+        import fcntl
+
+        remaining = raw_fp.length
+        if remaining:
+            # http.client may already hold the start of the body in its
+            # read buffer, which splice(2) would never see
+            head = raw_fp.fp.peek(remaining)[:remaining]
+            f.write(raw_fp.fp.read(len(head)))
+            f.flush()
+            remaining -= len(head)
+
+        sock_fd = raw_fp.fileno()
+        out_fd = f.fileno()
+        poller = select.poll()
+        poller.register(sock_fd, select.POLLIN)
+        read_end, write_end = os.pipe()
+        try:
+            try:
+                fcntl.fcntl(write_end, fcntl.F_SETPIPE_SZ, _COPY_BUFFER_SIZE)
+            except OSError:
+                pass  # keep the default pipe size
+
+            while remaining:
+                try:
+                    moved = os.splice(
+                        sock_fd, write_end, min(remaining, _COPY_BUFFER_SIZE))
+                except BlockingIOError:
+                    # Sockets with a timeout are non-blocking underneath
+                    if not poller.poll(self.config.timeout * 1000):
+                        raise NetworkError(f"Timed out reading {response.url}")
+                    continue
+                if not moved:
+                    raise NetworkError(
+                        f"Connection closed with {remaining} bytes left: {response.url}")
+                remaining -= moved
+                while moved:
+                    moved -= os.splice(read_end, out_fd, moved)
+        finally:
+            os.close(read_end)
+            os.close(write_end)
+
+        # The body is fully consumed; an empty read lets urllib3 return the
+        # connection to the pool
+        raw_fp.length = 0
+        response.raw.read()
+        return True
@@ -1,35 +1,66 @@
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+import time
+from dataclasses import dataclass, field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 
 class DownloaderConfig(BaseModel):
     """Configuration settings for the document downloader."""
+    # Run validators on assignment too, so allowed_extensions stays
+    # normalized however it is changed
+    model_config = ConfigDict(validate_assignment=True)
+
     max_retries: int = 3
+    max_concurrent_downloads: int = Field(16, ge=1)
     timeout: int = 30
     min_file_size: Optional[int] = None
     max_file_size: Optional[int] = None
     allowed_extensions: List[str] = ['.pdf', '.doc',
                                      '.docx', '.xls', '.xlsx', '.ppt', '.pptx']
+    allowed_hosts: List[str] = []
     verify_ssl: bool = True
+    http2: bool = True
     user_agent: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
+    @field_validator('allowed_extensions')
+    @classmethod
+    def _normalize_extensions(cls, v: List[str]) -> List[str]:
+        """Lowercase extensions and make sure each starts with a dot."""
+        return [
+            ext.lower() if ext.startswith('.') else '.' + ext.lower()
+            for ext in v if ext
+        ]
+
+    @property
+    def ext_tuple(self) -> Tuple[str, ...]:
+        """Allowed extensions as a tuple, ready for str.endswith().
+
+        Not cached: model_copy(update=...) bypasses validation and would
+        carry a cached tuple over unchanged.
+        """
+        return tuple(self.allowed_extensions)
 
-class DownloadReport(BaseModel):
+
+@dataclass(slots=True)
+class DownloadReport:
     """Report containing download operation statistics and details."""
+    start_time: datetime
     success_count: int = 0
     failed_count: int = 0
     skipped_count: int = 0
-    successful_files: List[str] = []
-    failed_files: Dict[str, str] = {}
-    skipped_files: List[str] = []
+    successful_files: List[str] = field(default_factory=list)
+    failed_files: Dict[str, str] = field(default_factory=dict)
+    skipped_files: List[str] = field(default_factory=list)
     total_size: int = 0
-    start_time: datetime
     end_time: Optional[datetime] = None
+    # Monotonic timestamps, immune to wall clock adjustments
+    start_ns: int = field(default_factory=time.monotonic_ns)
+    end_ns: Optional[int] = None
 
     @property
     def duration(self) -> float:
         """Calculate duration of download operation in seconds."""
-        if self.end_time is None:
+        if self.end_ns is None:
             return 0.0
-        return (self.end_time - self.start_time).total_seconds()
+        return (self.end_ns - self.start_ns) / 1e9
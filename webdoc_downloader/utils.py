@@ -1,4 +1,5 @@
 import logging
+import os
 from pathlib import Path
 from typing import Optional, List
 from urllib.parse import urlparse
@@ -25,7 +26,27 @@ def is_valid_file(filename: str, allowed_extensions: Optional[List[str]] = None)
     return Path(filename).suffix.lower() in allowed_extensions
 
 
+# Replace characters that are reserved on common file systems and drop
+# control characters, in a single str.translate() pass
+_SANITIZE_TABLE = str.maketrans(
+    {c: '_' for c in '<>:"/\\|?*'} | {chr(i): None for i in range(32)}
+)
+
+
+# Most file systems limit a name to 255 bytes, not characters
+_MAX_FILENAME_BYTES = 255
+
+
 def sanitize_filename(filename: str) -> str:
     """Clean filename to ensure it's valid for the file system."""
-    # TODO: Implement filename sanitization
-    return filename
+    filename = filename.translate(_SANITIZE_TABLE) or '_'
+    if len(filename.encode('utf-8')) <= _MAX_FILENAME_BYTES:
+        return filename
+
+    # Shorten the stem so the extension survives; errors='ignore' drops a
+    # multibyte character cut in half
+    stem, suffix = os.path.splitext(filename)
+    budget = _MAX_FILENAME_BYTES - len(suffix.encode('utf-8'))
+    if budget <= 0:
+        stem, suffix, budget = filename, '', _MAX_FILENAME_BYTES
+    return stem.encode('utf-8')[:budget].decode('utf-8', errors='ignore') + suffix